@@ -1,158 +1,404 @@
+import asyncio
+import atexit
+import functools
+import hmac
+import importlib.util
 import logging
 import os
-from fastapi import FastAPI, HTTPException, Header, Request
-from pydantic import BaseModel
+import queue
+import time
+from contextlib import AsyncExitStack, asynccontextmanager, suppress
+from logging.handlers import QueueHandler, QueueListener
+from typing import Annotated
+import orjson
+from fastapi import Depends, FastAPI, HTTPException, Header, Request, Response
+from fastapi.openapi.docs import (
+    get_redoc_html,
+    get_swagger_ui_html,
+    get_swagger_ui_oauth2_redirect_html,
+)
+from pydantic import BaseModel, StringConstraints
 import uvicorn
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Configure logging
+# Configure logging. Records are formatted by the caller and queued, and a
+# listener thread writes them out so the event loop never blocks on the stream.
+_log_queue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, logging.StreamHandler())
+# force replaces handlers installed when app.py also ran as __main__, so records
+# reach this module's listener
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[QueueHandler(_log_queue)],
+    force=True
 )
+_log_listener.start()
+# Flush queued log records before the process exits
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
-# Get environment configuration
-ENVIRONMENT = os.environ.get('ENVIRONMENT', 'LOCAL').upper()
+CLOUD_ENVIRONMENTS = frozenset({'CLOUD-DEV', 'CLOUD-PROD'})
+
+
+def _resolve_environment():
+    """Resolve the runtime environment, falling back to LOCAL without aiobotocore"""
+    environment = os.environ.get('ENVIRONMENT', 'LOCAL').upper()
+    # Check for aiobotocore without importing it, it is only loaded once a
+    # client is made
+    if (
+        environment in CLOUD_ENVIRONMENTS
+        and importlib.util.find_spec('aiobotocore') is None
+    ):
+        logger.warning(
+            "aiobotocore not available, falling back to environment variables"
+        )
+        return 'LOCAL'
+    return environment
+
+
+# Get environment configuration, fixed for the lifetime of the process
+ENVIRONMENT = _resolve_environment()
 AWS_REGION = os.environ.get('AWS_REGION', 'ap-south-1')
+API_KEY_CACHE_TTL = float(os.environ.get('API_KEY_CACHE_TTL', '300'))
+# The API_KEY fallback is only cached briefly so Parameter Store is retried soon
+API_KEY_FALLBACK_TTL = float(os.environ.get('API_KEY_FALLBACK_TTL', '30'))
+# Lower bound on the background refresh interval, however small the TTL
+_MIN_API_KEY_REFRESH_INTERVAL = 1.0
+
+# Keys are kept as bytes so every comparison can work on them directly
+_LOCAL_API_KEY = os.environ.get('API_KEY', 'bijonguha').encode()
+
+# Cached API key so the Parameter Store lookup happens at most once per TTL
+_API_KEY_CACHE = {"value": None, "expires": 0.0}
+_API_KEY_LOCK = asyncio.Lock()
 
-# Initialize AWS clients only for cloud environments
+# AWS clients are only used in cloud environments and are created per worker
+# on startup (see lifespan)
 ssm_client = None
-if ENVIRONMENT in ['CLOUD-DEV', 'CLOUD-PROD']:
-    try:
-        import boto3
-        from botocore.exceptions import ClientError  # noqa: F401
-        ssm_client = boto3.client('ssm', region_name=AWS_REGION)
-        logger.info(f"Initialized AWS SSM client for {ENVIRONMENT} environment")
-    except ImportError:
-        logger.warning("boto3 not available, falling back to environment variables")
-        ENVIRONMENT = 'LOCAL'
+
+
+@functools.cache
+def _aws_session():
+    """Return the aiobotocore session, importing it only when it is needed"""
+    from aiobotocore.session import get_session
+    return get_session()
+
+
+def _create_ssm_client():
+    """Create the async SSM client context for the current event loop"""
+    from aiobotocore.config import AioConfig
+
+    # Larger keep-alive pool and tight timeouts for bursts of lookups
+    config = AioConfig(
+        max_pool_connections=50,
+        connect_timeout=1.0,
+        read_timeout=2.0,
+        retries={"max_attempts": 2, "mode": "standard"}
+    )
+    return _aws_session().create_client(
+        'ssm',
+        region_name=AWS_REGION,
+        config=config
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Manage per-worker resources for the lifetime of the app"""
+    global ssm_client
+    async with AsyncExitStack() as stack:
+        if ENVIRONMENT in CLOUD_ENVIRONMENTS:
+            ssm_client = await stack.enter_async_context(_create_ssm_client())
+            logger.info(
+                "Initialized AWS SSM client for %s environment", ENVIRONMENT
+            )
+
+        # Warm the API key cache so the first request doesn't pay for the lookup
+        try:
+            await get_api_key()
+        except Exception:
+            logger.warning("API key prewarm failed")
+
+        # With caching disabled there is nothing to keep warm
+        refresh_task = None
+        if API_KEY_CACHE_TTL > 0:
+            refresh_task = asyncio.create_task(_refresh_api_key_loop())
+        yield
+
+        if refresh_task is not None:
+            refresh_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await refresh_task
+
+    # The client is closed once the exit stack unwinds
+    ssm_client = None
+
 
 app = FastAPI(
     title=f"FastAPI App - {ENVIRONMENT}",
     description=f"FastAPI application running in {ENVIRONMENT} environment",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # The schema and docs routes are registered explicitly below
+    openapi_url=None,
+    docs_url=None,
+    redoc_url=None
 )
+OPENAPI_URL = "/openapi.json"
+
+
+APIKeyHeader = Annotated[str | None, Header(alias="X-API-Key")]
 
 
 class HelloRequest(BaseModel):
-    name: str
-
-
-def get_api_key():
-    """Retrieve API key based on environment"""
-    logger.info(f"Getting API key for environment: {ENVIRONMENT}")
-
-    if ENVIRONMENT == 'LOCAL':
-        # For local development, use environment variable
-        api_key = os.environ.get('API_KEY', 'bijonguha')
-        logger.info("Retrieved API key from environment variable")
-        return api_key
-
-    elif ENVIRONMENT in ['CLOUD-DEV', 'CLOUD-PROD']:
-        # For cloud environments, use AWS Parameter Store
-        if not ssm_client:
-            logger.error("SSM client not available")
-            raise HTTPException(
-                status_code=500,
-                detail="AWS SSM client not configured"
-            )
+    name: Annotated[
+        str,
+        StringConstraints(strip_whitespace=True, min_length=1, max_length=128)
+    ]
 
-        try:
-            response = ssm_client.get_parameter(
-                Name='API_KEY',
-                WithDecryption=True
-            )
-            logger.info("Retrieved API key from AWS Parameter Store")
-            return response['Parameter']['Value']
-        except Exception as e:
-            logger.error(f"Failed to retrieve API key from Parameter Store: {e}")
-            # Fallback to environment variable
-            api_key = os.environ.get('API_KEY')
-            if api_key:
-                logger.warning("Falling back to environment variable for API key")
-                return api_key
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to retrieve API key"
-            )
 
-    else:
-        logger.error(f"Unknown environment: {ENVIRONMENT}")
+class ParameterStoreError(HTTPException):
+    """Raised when the API key could not be read from Parameter Store"""
+
+
+async def _local_api_key():
+    """Retrieve API key from environment variable for local development"""
+    return _LOCAL_API_KEY
+
+
+async def _parameter_store_api_key():
+    """Retrieve API key from AWS Parameter Store for cloud environments"""
+    if not ssm_client:
+        logger.error("SSM client not available")
         raise HTTPException(
             status_code=500,
-            detail=f"Unsupported environment: {ENVIRONMENT}"
+            detail="AWS SSM client not configured"
         )
 
+    try:
+        response = await ssm_client.get_parameter(
+            Name='API_KEY',
+            WithDecryption=True
+        )
+        logger.info("Retrieved API key from AWS Parameter Store")
+        return response['Parameter']['Value'].encode()
+    except Exception as e:
+        logger.error("Failed to retrieve API key from Parameter Store: %s", e)
+        raise ParameterStoreError(
+            status_code=500,
+            detail="Failed to retrieve API key"
+        )
 
-def verify_api_key(api_key: str = Header(None, alias="X-API-Key")):
+
+async def _unsupported_api_key():
+    """Reject API key lookups for an unknown environment"""
+    logger.error("Unknown environment: %s", ENVIRONMENT)
+    raise HTTPException(
+        status_code=500,
+        detail=f"Unsupported environment: {ENVIRONMENT}"
+    )
+
+
+def _select_api_key_fetcher(environment):
+    """Pick the API key retrieval function for an environment"""
+    if environment == 'LOCAL':
+        return _local_api_key
+    if environment in CLOUD_ENVIRONMENTS:
+        return _parameter_store_api_key
+    return _unsupported_api_key
+
+
+# ENVIRONMENT is fixed after startup, so bind the lookup once
+_fetch_api_key = _select_api_key_fetcher(ENVIRONMENT)
+
+
+def _cached_api_key():
+    """Return the cached API key, or None if the cache is cold or expired"""
+    if time.monotonic() < _API_KEY_CACHE["expires"]:
+        return _API_KEY_CACHE["value"]
+    return None
+
+
+async def get_api_key():
+    """Return the API key as bytes, refreshing the cache once the TTL has expired"""
+    cached = _cached_api_key()
+    if cached is not None:
+        return cached
+
+    async with _API_KEY_LOCK:
+        # Another request may have refreshed the cache while we waited
+        cached = _cached_api_key()
+        if cached is not None:
+            return cached
+        return await _refresh_api_key()
+
+
+def _store_api_key(api_key, ttl):
+    """Store the API key in the cache for ttl seconds"""
+    _API_KEY_CACHE["value"] = api_key
+    _API_KEY_CACHE["expires"] = time.monotonic() + ttl
+
+
+async def _refresh_api_key():
+    """Fetch the API key and store it in the cache"""
+    logger.info("Getting API key for environment: %s", ENVIRONMENT)
+    try:
+        api_key = await _fetch_api_key()
+        ttl = API_KEY_CACHE_TTL
+    except ParameterStoreError:
+        # Fallback to environment variable
+        fallback_api_key = os.environ.get('API_KEY')
+        if not fallback_api_key:
+            raise
+        logger.warning("Falling back to environment variable for API key")
+        api_key = fallback_api_key.encode()
+        ttl = min(API_KEY_FALLBACK_TTL, API_KEY_CACHE_TTL)
+
+    _store_api_key(api_key, ttl)
+    return api_key
+
+
+async def _refresh_api_key_loop():
+    """Refresh the cached API key shortly before it expires"""
+    interval = max(API_KEY_CACHE_TTL * 0.8, _MIN_API_KEY_REFRESH_INTERVAL)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # No environment fallback here, a failed refresh keeps the current key
+            async with _API_KEY_LOCK:
+                _store_api_key(await _fetch_api_key(), API_KEY_CACHE_TTL)
+        except Exception:
+            logger.warning("Background API key refresh failed")
+
+
+async def verify_api_key(api_key: APIKeyHeader = None):
     """Verify API key from header"""
     if not api_key:
         logger.warning("API key missing in request")
         raise HTTPException(status_code=401, detail="API key required")
 
-    try:
-        stored_api_key = get_api_key()
-        if api_key != stored_api_key:
-            logger.warning(f"Invalid API key provided: {api_key[:4]}***")
-            raise HTTPException(status_code=401, detail="Invalid API key")
-        logger.info("API key verified successfully")
-    except HTTPException:
-        # Re-raise HTTP exceptions (like 401, 500)
-        raise
-    except Exception as e:
-        logger.error(f"API key verification failed: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail="API key verification failed"
-        )
+    # get_api_key reports lookup failures as HTTPException (500) itself
+    stored_api_key = await get_api_key()
+    if not hmac.compare_digest(api_key.encode(), stored_api_key):
+        logger.warning("Invalid API key provided: %s***", api_key[:4])
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+
+# These payloads never change after startup, so serialize them once
+_HEALTH_BYTES = orjson.dumps({
+    "status": "healthy",
+    "code": 200,
+    "environment": ENVIRONMENT,
+    "region": AWS_REGION
+})
+_INFO_BYTES = orjson.dumps({
+    "environment": ENVIRONMENT,
+    "aws_region": AWS_REGION,
+    "title": app.title,
+    "version": app.version
+})
 
 
 @app.get("/healthcheck")
 async def healthcheck():
     """Health check endpoint"""
-    logger.info("Health check requested")
-    return {
-        "status": "healthy",
-        "code": 200,
-        "environment": ENVIRONMENT,
-        "region": AWS_REGION
-    }
+    return Response(content=_HEALTH_BYTES, media_type="application/json")
 
 
 @app.get("/info")
 async def info():
     """Application info endpoint"""
-    return {
-        "environment": ENVIRONMENT,
-        "aws_region": AWS_REGION,
-        "title": app.title,
-        "version": app.version
-    }
+    return Response(content=_INFO_BYTES, media_type="application/json")
 
 
 @app.post("/hello")
 async def hello(
     request: HelloRequest,
     request_obj: Request,
-    api_key: str = Header(None, alias="X-API-Key")
+    _: None = Depends(verify_api_key)
 ):
     """Hello endpoint with API key verification"""
-    # Verify API key
-    verify_api_key(api_key)
+    # Log the request, reading the client address straight from the ASGI scope
+    if logger.isEnabledFor(logging.INFO):
+        client = request_obj.scope.get("client")
+        client_ip = client[0] if client else "-"
+        logger.info("Hello request from %s for user: %s", client_ip, request.name)
+
+    # Fixed-shape payload, only the message string needs JSON escaping
+    payload = b'{"message":' + orjson.dumps(f"Hello {request.name}!") + b'}'
+    logger.debug("Response sent: Hello %s!", request.name)
+
+    return Response(content=payload, media_type="application/json")
+
+
+# Serialized schema per root_path, so the schema dict is only encoded once
+_OPENAPI_CACHE = {}
+
+
+@app.get(OPENAPI_URL, include_in_schema=False)
+async def openapi(req: Request):
+    """OpenAPI schema endpoint"""
+    root_path = req.scope.get("root_path", "").rstrip("/")
+    payload = _OPENAPI_CACHE.get(root_path)
+    if payload is None:
+        schema = app.openapi()
+        # Same servers handling as FastAPI's default schema route
+        if root_path and app.root_path_in_servers:
+            server_urls = {s.get("url") for s in schema.get("servers", [])}
+            if root_path not in server_urls:
+                schema = dict(schema)
+                schema["servers"] = [{"url": root_path}] + schema.get(
+                    "servers", []
+                )
+        payload = _OPENAPI_CACHE[root_path] = orjson.dumps(schema)
+    return Response(content=payload, media_type="application/json")
+
+
+@app.get("/docs", include_in_schema=False)
+async def swagger_ui_html(req: Request):
+    """Swagger UI documentation"""
+    root_path = req.scope.get("root_path", "").rstrip("/")
+    return get_swagger_ui_html(
+        openapi_url=root_path + OPENAPI_URL,
+        title=f"{app.title} - Swagger UI",
+        oauth2_redirect_url=root_path + "/docs/oauth2-redirect",
+        init_oauth=app.swagger_ui_init_oauth,
+        swagger_ui_parameters=app.swagger_ui_parameters
+    )
+
 
-    # Log the request
-    client_ip = request_obj.client.host
-    logger.info(f"Hello request from {client_ip} for user: {request.name}")
+@app.get("/docs/oauth2-redirect", include_in_schema=False)
+async def swagger_ui_redirect():
+    """Swagger UI OAuth2 redirect page"""
+    return get_swagger_ui_oauth2_redirect_html()
 
-    response = {"message": f"Hello {request.name}!"}
-    logger.info(f"Response sent: {response}")
 
-    return response
+@app.get("/redoc", include_in_schema=False)
+async def redoc_html(req: Request):
+    """ReDoc documentation"""
+    root_path = req.scope.get("root_path", "").rstrip("/")
+    return get_redoc_html(
+        openapi_url=root_path + OPENAPI_URL,
+        title=f"{app.title} - ReDoc"
+    )
 
 
 if __name__ == "__main__":
     # Run the application
-    uvicorn.run(app, host="0.0.0.0", port=8080)  # nosec B104
\ No newline at end of file
+    # Workers need the import string form so each process loads its own app
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",  # nosec B104
+        port=8080,
+        # One worker by default, os.cpu_count() ignores container CPU quotas.
+        # Set WEB_CONCURRENCY to run more on hosts with spare cores.
+        workers=int(os.environ.get('WEB_CONCURRENCY', '1')),
+        # uvloop when it is installed, asyncio otherwise (e.g. on Windows)
+        loop="auto",
+        http="httptools",
+        log_level="warning",
+        access_log=False
+    )
\ No newline at end of file
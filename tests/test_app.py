@@ -1,12 +1,24 @@
+import asyncio
 import pytest
 import json
+import logging
 import os
-from unittest.mock import patch, MagicMock
+import time
+from unittest.mock import patch, AsyncMock, MagicMock
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
+import app as app_module
 from app import app
 
 client = TestClient(app)
 
+@pytest.fixture(autouse=True)
+def reset_api_key_cache():
+    """Start every test with an empty API key cache"""
+    app_module._API_KEY_CACHE.update(value=None, expires=0.0)
+    yield
+    app_module._API_KEY_CACHE.update(value=None, expires=0.0)
+
 class TestHealthCheck:
     def test_healthcheck_endpoint(self):
         """Test the health check endpoint"""
@@ -23,7 +35,7 @@ class TestHelloEndpoint:
     def test_hello_with_valid_api_key(self, mock_get_api_key):
         """Test hello endpoint with valid API key"""
         # Mock get_api_key to return expected key
-        mock_get_api_key.return_value = 'bijonguha'
+        mock_get_api_key.return_value = b'bijonguha'
         
         response = client.post(
             "/hello",
@@ -38,7 +50,7 @@ class TestHelloEndpoint:
     def test_hello_with_invalid_api_key(self, mock_get_api_key):
         """Test hello endpoint with invalid API key"""
         # Mock get_api_key to return expected key
-        mock_get_api_key.return_value = 'bijonguha'
+        mock_get_api_key.return_value = b'bijonguha'
         
         response = client.post(
             "/hello",
@@ -49,6 +61,63 @@ class TestHelloEndpoint:
         assert response.status_code == 401
         assert "Invalid API key" in response.json()["detail"]
 
+    @patch('app._fetch_api_key')
+    def test_hello_with_cached_api_key(self, mock_fetch):
+        """Test hello endpoint skips the key lookup when the cache is warm"""
+        app_module._API_KEY_CACHE.update(value=b'bijonguha', expires=float('inf'))
+
+        response = client.post(
+            "/hello",
+            json={"name": "Bijon"},
+            headers={"X-API-Key": "bijonguha"}
+        )
+
+        assert response.status_code == 200
+        mock_fetch.assert_not_called()
+
+    @patch('app.get_api_key')
+    def test_hello_logs_client_address(self, mock_get_api_key, caplog):
+        """Test hello endpoint logs the caller's address from the ASGI scope"""
+        mock_get_api_key.return_value = b'bijonguha'
+
+        with caplog.at_level(logging.INFO, logger="app"):
+            response = client.post(
+                "/hello",
+                json={"name": "Bijon"},
+                headers={"X-API-Key": "bijonguha"}
+            )
+
+        assert response.status_code == 200
+        assert "Hello request from testclient for user: Bijon" in caplog.text
+
+    @patch('app.get_api_key')
+    def test_hello_logs_response_message(self, mock_get_api_key, caplog):
+        """Test hello endpoint logs the response message rather than raw bytes"""
+        mock_get_api_key.return_value = b'bijonguha'
+
+        with caplog.at_level(logging.DEBUG, logger="app"):
+            client.post(
+                "/hello",
+                json={"name": "Bijon"},
+                headers={"X-API-Key": "bijonguha"}
+            )
+
+        assert "Response sent: Hello Bijon!" in caplog.text
+
+    @patch('app.get_api_key')
+    def test_hello_escapes_name(self, mock_get_api_key):
+        """Test hello endpoint returns valid JSON for names needing escaping"""
+        mock_get_api_key.return_value = b'bijonguha'
+
+        response = client.post(
+            "/hello",
+            json={"name": 'Bi"jon\\'},
+            headers={"X-API-Key": "bijonguha"}
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"message": 'Hello Bi"jon\\!'}
+
     def test_hello_without_api_key(self):
         """Test hello endpoint without API key"""
         response = client.post(
@@ -62,8 +131,11 @@ class TestHelloEndpoint:
     @patch('app.get_api_key')
     def test_hello_with_api_key_error(self, mock_get_api_key):
         """Test hello endpoint when get_api_key fails"""
-        # Mock get_api_key to raise an exception
-        mock_get_api_key.side_effect = Exception("API Key Error")
+        # Mock get_api_key to fail the way a Parameter Store lookup does
+        mock_get_api_key.side_effect = HTTPException(
+            status_code=500,
+            detail="Failed to retrieve API key"
+        )
         
         response = client.post(
             "/hello",
@@ -77,7 +149,7 @@ class TestHelloEndpoint:
     def test_hello_with_missing_name(self, mock_get_api_key):
         """Test hello endpoint with missing name in request body"""
         # Mock get_api_key to return expected key
-        mock_get_api_key.return_value = 'bijonguha'
+        mock_get_api_key.return_value = b'bijonguha'
         
         response = client.post(
             "/hello",
@@ -91,7 +163,7 @@ class TestHelloEndpoint:
     def test_hello_with_empty_name(self, mock_get_api_key):
         """Test hello endpoint with empty name"""
         # Mock get_api_key to return expected key
-        mock_get_api_key.return_value = 'bijonguha'
+        mock_get_api_key.return_value = b'bijonguha'
         
         response = client.post(
             "/hello",
@@ -99,12 +171,51 @@ class TestHelloEndpoint:
             headers={"X-API-Key": "bijonguha"}
         )
         
+        assert response.status_code == 422  # Validation error
+
+    @patch('app.get_api_key')
+    def test_hello_with_whitespace_only_name(self, mock_get_api_key):
+        """Test hello endpoint with a name made only of whitespace"""
+        mock_get_api_key.return_value = b'bijonguha'
+
+        response = client.post(
+            "/hello",
+            json={"name": "   "},
+            headers={"X-API-Key": "bijonguha"}
+        )
+
+        assert response.status_code == 422  # Validation error
+
+    @patch('app.get_api_key')
+    def test_hello_strips_name_whitespace(self, mock_get_api_key):
+        """Test hello endpoint trims surrounding whitespace from the name"""
+        mock_get_api_key.return_value = b'bijonguha'
+
+        response = client.post(
+            "/hello",
+            json={"name": "  Bijon  "},
+            headers={"X-API-Key": "bijonguha"}
+        )
+
         assert response.status_code == 200
-        assert response.json() == {"message": "Hello !"}
+        assert response.json() == {"message": "Hello Bijon!"}
+
+    @patch('app.get_api_key')
+    def test_hello_with_too_long_name(self, mock_get_api_key):
+        """Test hello endpoint with a name over the length limit"""
+        mock_get_api_key.return_value = b'bijonguha'
+
+        response = client.post(
+            "/hello",
+            json={"name": "x" * 129},
+            headers={"X-API-Key": "bijonguha"}
+        )
+
+        assert response.status_code == 422  # Validation error
 
 class TestAPIKeyValidation:
-    @patch('app.ssm_client')
-    @patch('app.ENVIRONMENT', 'CLOUD-DEV')
+    @patch('app.ssm_client', new_callable=AsyncMock)
+    @patch('app._fetch_api_key', app_module._parameter_store_api_key)
     def test_get_api_key_from_parameter_store_success(self, mock_ssm):
         """Test successful API key retrieval from parameter store"""
         mock_ssm.get_parameter.return_value = {
@@ -112,16 +223,16 @@ class TestAPIKeyValidation:
         }
         
         from app import get_api_key
-        result = get_api_key()
+        result = asyncio.run(get_api_key())
         
-        assert result == 'test-key'
+        assert result == b'test-key'
         mock_ssm.get_parameter.assert_called_once_with(
             Name='API_KEY',
             WithDecryption=True
         )
 
-    @patch('app.ssm_client')
-    @patch('app.ENVIRONMENT', 'CLOUD-DEV')
+    @patch('app.ssm_client', new_callable=AsyncMock)
+    @patch('app._fetch_api_key', app_module._parameter_store_api_key)
     @patch.dict(os.environ, {}, clear=True)  # Clear environment variables
     def test_get_api_key_from_parameter_store_failure(self, mock_ssm):
         """Test API key retrieval failure from parameter store with no fallback"""
@@ -133,16 +244,187 @@ class TestAPIKeyValidation:
         from app import get_api_key
         
         with pytest.raises(Exception):  # Should raise HTTPException when both SSM and env var fail
-            get_api_key()
+            asyncio.run(get_api_key())
 
-    @patch('app.ENVIRONMENT', 'LOCAL')
-    @patch.dict(os.environ, {'API_KEY': 'local-test-key'})
+    @patch('app._fetch_api_key', app_module._local_api_key)
+    @patch('app._LOCAL_API_KEY', b'local-test-key')
     def test_get_api_key_local_environment(self):
         """Test API key retrieval in LOCAL environment"""
         from app import get_api_key
-        result = get_api_key()
+        result = asyncio.run(get_api_key())
         
-        assert result == 'local-test-key'
+        assert result == b'local-test-key'
+
+    @patch('app.ssm_client', new_callable=AsyncMock)
+    @patch('app._fetch_api_key', app_module._parameter_store_api_key)
+    def test_get_api_key_is_cached(self, mock_ssm):
+        """Test that Parameter Store is only queried once within the TTL"""
+        mock_ssm.get_parameter.return_value = {
+            'Parameter': {'Value': 'test-key'}
+        }
+
+        from app import get_api_key
+        assert asyncio.run(get_api_key()) == b'test-key'
+        assert asyncio.run(get_api_key()) == b'test-key'
+
+        mock_ssm.get_parameter.assert_called_once()
+
+    @patch('app.ssm_client', new_callable=AsyncMock)
+    @patch('app._fetch_api_key', app_module._parameter_store_api_key)
+    def test_get_api_key_refreshes_after_ttl(self, mock_ssm):
+        """Test that an expired cache entry triggers a new lookup"""
+        mock_ssm.get_parameter.return_value = {
+            'Parameter': {'Value': 'test-key'}
+        }
+
+        asyncio.run(app_module.get_api_key())
+        app_module._API_KEY_CACHE["expires"] = 0.0
+        asyncio.run(app_module.get_api_key())
+
+        assert mock_ssm.get_parameter.call_count == 2
+
+    @patch('app._create_ssm_client')
+    @patch('app.ssm_client', None)
+    @patch('app.ENVIRONMENT', 'CLOUD-DEV')
+    def test_ssm_client_opened_and_closed_with_app(self, mock_create_ssm_client):
+        """Test that the SSM client lives for the lifetime of the app"""
+        client_context = mock_create_ssm_client.return_value
+        with TestClient(app):
+            assert app_module.ssm_client is client_context.__aenter__.return_value
+
+        client_context.__aexit__.assert_awaited_once()
+        assert app_module.ssm_client is None
+
+    @patch('aiobotocore.session.get_session')
+    def test_aws_session_is_memoized(self, mock_get_session):
+        """Test that SSM clients share one session and use the tuned config"""
+        app_module._aws_session.cache_clear()
+        try:
+            app_module._create_ssm_client()
+            app_module._create_ssm_client()
+        finally:
+            app_module._aws_session.cache_clear()
+
+        mock_get_session.assert_called_once_with()
+        create_client = mock_get_session.return_value.create_client
+        _, kwargs = create_client.call_args
+        assert kwargs["region_name"] == app_module.AWS_REGION
+        assert kwargs["config"].max_pool_connections == 50
+
+    @patch('importlib.util.find_spec', return_value=None)
+    @patch.dict(os.environ, {'ENVIRONMENT': 'cloud-prod'})
+    def test_environment_falls_back_to_local_without_aiobotocore(self, mock_find_spec):
+        """Test that cloud environments fall back to LOCAL without aiobotocore"""
+        assert app_module._resolve_environment() == 'LOCAL'
+
+    @patch.dict(os.environ, {'ENVIRONMENT': 'cloud-prod'})
+    def test_environment_resolved_from_env(self):
+        """Test that the environment name is normalized to upper case"""
+        assert app_module._resolve_environment() == 'CLOUD-PROD'
+
+    @patch('app._fetch_api_key', app_module._local_api_key)
+    @patch('app._LOCAL_API_KEY', b'local-test-key')
+    def test_api_key_prewarmed_on_startup(self):
+        """Test that the API key cache is filled when the app starts up"""
+        with TestClient(app):
+            assert app_module._cached_api_key() == b'local-test-key'
+
+    @patch('app._fetch_api_key')
+    def test_api_key_prewarm_failure_does_not_block_startup(self, mock_fetch):
+        """Test that a failed prewarm still lets the app start"""
+        mock_fetch.side_effect = Exception("API Key Error")
+
+        with TestClient(app) as startup_client:
+            response = startup_client.get("/healthcheck")
+
+        assert response.status_code == 200
+
+    @patch('app._MIN_API_KEY_REFRESH_INTERVAL', 0.01)
+    @patch('app.API_KEY_CACHE_TTL', 0.05)
+    @patch('app._fetch_api_key')
+    def test_api_key_refreshed_in_background(self, mock_fetch):
+        """Test that the refresh loop renews the cache before it expires"""
+        mock_fetch.return_value = b'rotated-key'
+
+        async def run_refresh_loop():
+            task = asyncio.create_task(app_module._refresh_api_key_loop())
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run_refresh_loop())
+
+        assert mock_fetch.called
+        assert app_module._API_KEY_CACHE["value"] == b'rotated-key'
+
+    def test_api_key_fetcher_selected_per_environment(self):
+        """Test that each environment binds the matching key lookup"""
+        assert app_module._select_api_key_fetcher('LOCAL') is app_module._local_api_key
+        assert (
+            app_module._select_api_key_fetcher('CLOUD-PROD')
+            is app_module._parameter_store_api_key
+        )
+        assert (
+            app_module._select_api_key_fetcher('STAGING')
+            is app_module._unsupported_api_key
+        )
+
+    @patch('app.ssm_client', new_callable=AsyncMock)
+    @patch('app._fetch_api_key', app_module._parameter_store_api_key)
+    @patch.dict(os.environ, {'API_KEY': 'fallback-key'})
+    def test_get_api_key_fallback_cached_briefly(self, mock_ssm):
+        """Test that the API_KEY fallback is cached for the short fallback TTL"""
+        mock_ssm.get_parameter.side_effect = Exception("Throttled")
+
+        assert asyncio.run(app_module.get_api_key()) == b'fallback-key'
+
+        remaining = app_module._API_KEY_CACHE["expires"] - time.monotonic()
+        assert remaining <= app_module.API_KEY_FALLBACK_TTL
+
+    @patch('app._MIN_API_KEY_REFRESH_INTERVAL', 0.01)
+    @patch('app.API_KEY_CACHE_TTL', 0.05)
+    @patch('app.ssm_client', new_callable=AsyncMock)
+    @patch('app._fetch_api_key', app_module._parameter_store_api_key)
+    @patch.dict(os.environ, {'API_KEY': 'fallback-key'})
+    def test_background_refresh_failure_keeps_cached_key(self, mock_ssm):
+        """Test that a failed background refresh keeps the current key"""
+        mock_ssm.get_parameter.side_effect = Exception("Throttled")
+        app_module._API_KEY_CACHE.update(value=b'good-key', expires=float('inf'))
+
+        async def run_refresh_loop():
+            task = asyncio.create_task(app_module._refresh_api_key_loop())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run_refresh_loop())
+
+        assert mock_ssm.get_parameter.called
+        assert app_module._API_KEY_CACHE["value"] == b'good-key'
+
+    @patch('app.API_KEY_CACHE_TTL', 0.0)
+    @patch('app._refresh_api_key_loop')
+    def test_background_refresh_disabled_without_cache_ttl(self, mock_refresh_loop):
+        """Test that no refresh task is started when caching is disabled"""
+        with TestClient(app):
+            pass
+
+        mock_refresh_loop.assert_not_called()
+
+class TestLogging:
+    def test_log_records_written_without_lifespan(self):
+        """Test that queued log records are written as soon as app is imported"""
+        stream_handler = app_module._log_listener.handlers[0]
+        with patch.object(stream_handler, 'handle') as mock_handle:
+            logging.getLogger("app").warning("Queued log record")
+
+            deadline = time.monotonic() + 1.0
+            while not mock_handle.called and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        assert mock_handle.call_args.args[0].getMessage().endswith("Queued log record")
 
 class TestInfoEndpoint:
     def test_info_endpoint(self):
@@ -154,6 +436,8 @@ class TestInfoEndpoint:
         assert "aws_region" in response_data
         assert "title" in response_data
         assert "version" in response_data
+        assert response_data["title"] == app.title
+        assert response_data["version"] == app.version
 
 class TestDocumentation:
     def test_openapi_docs_accessible(self):
@@ -165,4 +449,44 @@ class TestDocumentation:
         """Test that OpenAPI JSON is accessible"""
         response = client.get("/openapi.json")
         assert response.status_code == 200
-        assert "openapi" in response.json()
\ No newline at end of file
+        assert "openapi" in response.json()
+
+    def test_openapi_json_is_cached(self):
+        """Test that the OpenAPI schema is only serialized once"""
+        client.get("/openapi.json")
+
+        with patch.object(app, 'openapi') as mock_openapi:
+            response = client.get("/openapi.json")
+
+        assert response.status_code == 200
+        assert "/hello" in response.json()["paths"]
+        mock_openapi.assert_not_called()
+
+    def test_openapi_json_includes_root_path_server(self):
+        """Test that the schema lists the proxy root_path as a server"""
+        proxied_client = TestClient(app, root_path="/api")
+        response = proxied_client.get("/openapi.json")
+
+        assert response.status_code == 200
+        assert response.json()["servers"] == [{"url": "/api"}]
+
+    def test_docs_point_at_root_path_schema(self):
+        """Test that the docs page loads the schema through the root_path"""
+        proxied_client = TestClient(app, root_path="/api")
+        response = proxied_client.get("/docs")
+
+        assert response.status_code == 200
+        assert "/api/openapi.json" in response.text
+
+    @patch.object(app, 'swagger_ui_parameters', {"deepLinking": False})
+    def test_docs_use_swagger_ui_parameters(self):
+        """Test that the docs page honours the app's Swagger UI parameters"""
+        response = client.get("/docs")
+
+        assert response.status_code == 200
+        assert '"deepLinking": false' in response.text
+
+    def test_redoc_accessible(self):
+        """Test that ReDoc docs are accessible"""
+        response = client.get("/redoc")
+        assert response.status_code == 200
\ No newline at end of file